@@ -22,6 +22,7 @@
         'security/ir.model.access.csv',
         'views/boleta_honorarios_views.xml',
         'views/res_config_settings_views.xml',
+        'data/ir_cron_mail_data.xml',
         #'data/ir_cron_data.xml',
         
     ],
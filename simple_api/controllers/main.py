@@ -1,5 +1,5 @@
-import base64
 from odoo import http
+from odoo.exceptions import MissingError
 from odoo.http import request
 
 class BoletaHonorariosController(http.Controller):
@@ -11,15 +11,16 @@ class BoletaHonorariosController(http.Controller):
     @http.route('/boleta_honorarios/download/<int:boleta_id>', type='http', auth='user')
     def download_pdf(self, boleta_id, **kwargs):
         boleta = request.env['boleta.honorarios'].browse(boleta_id)
-        if not boleta.exists() or not boleta.pdf_file:
+        if not boleta.exists():
             return request.not_found()
-        return request.make_response(
-            base64.b64decode(boleta.pdf_file),
-            headers=[
-                ('Content-Type', 'application/pdf'),
-                ('Content-Disposition', f'inline; filename="{boleta.pdf_filename or "boleta.pdf"}"'),
-            ]
-        )
+        boleta.check_access('read')
+        # Se sirve el archivo del filestore tal cual, sin pasar por base64
+        try:
+            stream = request.env['ir.binary']._get_stream_from(
+                boleta, 'pdf_file', filename=boleta.pdf_filename or 'boleta.pdf', mimetype='application/pdf')
+        except MissingError:
+            return request.not_found()
+        return stream.get_response(as_attachment=False)
 
     # Opcional: expone anulación vía ruta interna
     @http.route('/boleta_honorarios/anular/<int:boleta_id>/<motivo>', type='json', auth='user', methods=['POST'], csrf=False)
@@ -1,14 +1,85 @@
 # -*- coding: utf-8 -*-
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
 import base64
-import time
-from odoo import models, fields, api, _
+import re
+from http.cookiejar import DefaultCookiePolicy
+import functools
+from datetime import timedelta
+from itertools import cycle
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from odoo import models, fields, api, tools, _
 from odoo.exceptions import UserError, ValidationError
 import logging
 
 _logger = logging.getLogger(__name__)
 
+# orjson es opcional: si no está instalado se usa el json de la librería estándar
+try:
+    import orjson
+
+    def _json_dumps(obj):
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+
+    _json_body = orjson.dumps
+    _json_loads = orjson.loads
+except ImportError:
+    def _json_dumps(obj):
+        return json.dumps(obj, indent=2)
+
+    def _json_body(obj):
+        return json.dumps(obj).encode()
+
+    _json_loads = json.loads
+
+_BASE_HEADERS = {
+    'Content-Type': 'application/json',
+    'Accept': 'application/json',
+    'User-Agent': 'odoo-18-bhe',
+    'Connection': 'keep-alive',
+}
+
+# Sesión HTTP compartida: reutiliza conexiones (keep-alive) entre llamadas a SimpleAPI.
+# Retry solo reintenta métodos idempotentes ante status 5xx; un POST únicamente se
+# reintenta si falla la conexión, por lo que no se duplican emisiones.
+# El pool y los reintentos solo aplican a https://; un base_url http:// usa el adaptador
+# por defecto de requests, sin pool propio ni reintentos.
+# La sesión se comparte entre bases de datos, hilos y API keys del worker, por lo que
+# no guarda cookies: una cookie de SimpleAPI no debe viajar en peticiones de otro cliente.
+_SESSION = requests.Session()
+_SESSION.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+_SESSION.headers.update(_BASE_HEADERS)
+_SESSION.mount('https://', HTTPAdapter(
+    pool_maxsize=16,
+    max_retries=Retry(total=2, backoff_factor=0.3, status_forcelist=[502, 503, 504]),
+))
+
+# Claves alternativas que usa SimpleAPI en la respuesta de emisión, en orden de preferencia
+_SUCCESS_KEYS = ('success', 'numeroDocumento', 'numero', 'folio')
+_FOLIO_KEYS = ('folio', 'numeroDocumento', 'numero_boleta', 'numeroBoleta', 'numero')
+_ANIO_KEYS = ('anio', 'anioFolio', 'year', 'anio_emision', 'anioFolioEmitido')
+_ERROR_KEYS = ('error', 'mensaje', 'message', 'descripcion', 'detalle')
+
+# Región del receptor según el nombre de la provincia/estado del partner
+_REGION_BY_STATE = {'Santiago': '13', 'Valparaíso': '5', 'Concepción': '8'}
+
+# Palabras clave de anulación exitosa cuando SimpleAPI responde texto plano (se busca en el primer KB)
+_ANUL_OK_RE = re.compile(rb'anulada|correctamente', re.IGNORECASE)
+_ANUL_SCAN_BYTES = 1024
+
+# Valores de 'success' que SimpleAPI usa para indicar éxito
+_TRUTHY = frozenset(('true', '1', 'yes'))
+
+# Reintentos de la solicitud de correo en cron_send_pending_mails
+_MAIL_MAX_ATTEMPTS = 3
+_MAIL_RETRY_MINUTES = 15
+
+# Máximo de emisiones simultáneas contra SimpleAPI en action_emitir_boleta
+_EMIT_MAX_WORKERS = 8
+
+@functools.lru_cache(maxsize=16)
 def _mask_key(key: str, show_start: int = 6, show_end: int = 4) -> str:
     """
     Enmascara una API Key, dejando ver los primeros y últimos caracteres.
@@ -24,6 +95,32 @@ def _mask_key(key: str, show_start: int = 6, show_end: int = 4) -> str:
     except Exception:
         return '******'
 
+_RUT_TRANS = str.maketrans('', '', '.-')
+# Pesos módulo 11 (2..7 cíclico) y dígito verificador indexado por el resto
+_RUT_WEIGHTS = (2, 3, 4, 5, 6, 7)
+_RUT_DV = '0K987654321'
+
+def _clean_rut(rut: str) -> str:
+    """
+    Quita puntos y guion de un RUT en una sola pasada.
+    """
+    return rut.translate(_RUT_TRANS)
+
+def _preview(resp, limit: int = 300) -> str:
+    """
+    Primeros caracteres del cuerpo para logs/mensajes, sin decodificar la respuesta completa.
+    """
+    return resp.content[:limit].decode('utf-8', 'replace') if resp.content else ''
+
+def _post_emitir(data, config):
+    """
+    POST a /bhe/emitir. No usa el ORM, por lo que puede ejecutarse fuera del hilo principal.
+    """
+    url = f"{config['base_url']}/bhe/emitir"
+    if _logger.isEnabledFor(logging.INFO):
+        _logger.info("🚀 [BHE] POST emitir -> %s key=%s", url, _mask_key(config['api_key']))
+    return _SESSION.post(url, data=_json_body(data), headers=config['headers'], timeout=config['timeout'])
+
 class BoletaHonorarios(models.Model):
     _name = 'boleta.honorarios'
     _description = 'Boleta de Honorarios SimpleAPI'
@@ -82,6 +179,12 @@ class BoletaHonorarios(models.Model):
 
     # Envío por correo
     email_destinatario = fields.Char('Correo destinatario', help='Correo al que se enviará la boleta al emitir')
+    mail_pending = fields.Boolean('Correo pendiente', default=False, copy=False,
+                                  help='El correo se solicitará a SimpleAPI desde la acción planificada')
+    mail_scheduled_at = fields.Datetime('Correo programado para', copy=False)
+    mail_anio = fields.Integer('Año del folio', copy=False, help='Año usado para solicitar el correo del folio')
+    mail_attempts = fields.Integer('Intentos de correo', default=0, copy=False)
+    mail_error = fields.Text('Error de correo', copy=False)
 
     # Seguimiento
     error_message = fields.Text('Mensaje de Error')
@@ -95,20 +198,53 @@ class BoletaHonorarios(models.Model):
         ('3', '3: Error en la digitación'),
     ], string='Motivo de anulación', help='Motivo exigido por el endpoint de anulación')
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        # Igual que _onchange_receptor_data, pero resolviendo todos los RUT con una sola búsqueda
+        vats = {vals['receptor_rut'] for vals in vals_list if vals.get('receptor_rut') and not vals.get('partner_id')}
+        partners = self._resolve_partners_by_vat(vats)
+        for vals in vals_list:
+            partner = not vals.get('partner_id') and partners.get(vals.get('receptor_rut'))
+            if partner:
+                vals['partner_id'] = partner.id
+                for key, value in self._receptor_vals_from_partner(partner).items():
+                    vals.setdefault(key, value)
+        return super().create(vals_list)
+
+    @api.model
+    def _resolve_partners_by_vat(self, vats):
+        """
+        Devuelve {vat: res.partner} con una única búsqueda; ante RUT repetidos gana el primero según el orden del modelo.
+        """
+        if not vats:
+            return {}
+        partners = {}
+        for partner in self.env['res.partner'].search([('vat', 'in', list(vats))]):
+            partners.setdefault(partner.vat, partner)
+        return partners
+
+    @api.model
+    def _receptor_vals_from_partner(self, partner):
+        vals = {
+            'receptor_rut': partner.vat or '',
+            'receptor_nombre': partner.name or '',
+            'receptor_direccion': partner.street or '',
+        }
+        if partner.state_id:
+            vals['receptor_region'] = _REGION_BY_STATE.get(partner.state_id.name, '13')
+        if partner.city:
+            vals['receptor_comuna'] = partner.city
+        if partner.email:
+            vals['email_destinatario'] = partner.email
+        return vals
+
     @api.onchange('partner_id')
     def _onchange_partner_id(self):
         if self.partner_id:
-            partner = self.partner_id
-            self.receptor_rut = partner.vat or ''
-            self.receptor_nombre = partner.name or ''
-            self.receptor_direccion = partner.street or ''
-            if partner.state_id:
-                region_mapping = {'Santiago': '13', 'Valparaíso': '5', 'Concepción': '8'}
-                self.receptor_region = region_mapping.get(partner.state_id.name, '13')
-            if partner.city:
-                self.receptor_comuna = partner.city
-            if not self.email_destinatario and partner.email:
-                self.email_destinatario = partner.email
+            vals = self._receptor_vals_from_partner(self.partner_id)
+            if self.email_destinatario:
+                vals.pop('email_destinatario', None)
+            self.update(vals)
 
     @api.onchange('receptor_rut', 'receptor_nombre')
     def _onchange_receptor_data(self):
@@ -120,52 +256,97 @@ class BoletaHonorarios(models.Model):
 
     @api.model
     def get_simpleapi_config(self):
+        # Copia: el dict cacheado se comparte entre todas las llamadas del worker
+        return dict(self._get_simpleapi_config_cached())
+
+    # ir.config_parameter limpia el caché del registro al escribirse, lo que invalida este valor
+    @api.model
+    @tools.ormcache()
+    def _get_simpleapi_config_cached(self):
         config = self.env['ir.config_parameter'].sudo()
         api_key = config.get_param('boleta_honorarios.simpleapi_api_key', '4648-N330-6392-2590-9354')
         base_url = config.get_param('boleta_honorarios.simpleapi_base_url', 'https://servicios.simpleapi.cl/api')
         timeout = int(config.get_param('boleta_honorarios.simpleapi_timeout', '30'))
-        _logger.info(f"[BHE] Config SimpleAPI base_url={base_url} api_key={_mask_key(api_key)} timeout={timeout}")
+        log_inicio = bool(config.get_param('boleta_honorarios.simpleapi_log_inicio', False))
+        if _logger.isEnabledFor(logging.INFO):
+            _logger.info("[BHE] Config SimpleAPI base_url=%s api_key=%s timeout=%s", base_url, _mask_key(api_key), timeout)
         return {
             'api_key': api_key,
+            # Solo la autorización; el resto de cabeceras van en _SESSION (requests las combina)
+            'headers': {'Authorization': api_key},
             'base_url': base_url,
-            'timeout': timeout
+            'timeout': timeout,
+            'log_inicio': log_inicio,
         }  # [1][3]
 
     def action_emitir_boleta(self):
+        config = self.get_simpleapi_config()
+        pending = []
         for record in self:
             try:
-                record.state = 'processing'
-                record.intentos += 1
-                record.fecha_procesamiento = fields.Datetime.now()
-                record.message_post(body="Iniciando emisión de boleta de honorarios...")
+                record.write({
+                    'state': 'processing',
+                    'intentos': record.intentos + 1,
+                    'fecha_procesamiento': fields.Datetime.now(),
+                })
+                if config['log_inicio']:
+                    record.message_post(body="Iniciando emisión de boleta de honorarios...")
                 if not record.descripcion_servicio:
                     raise UserError(_('Debe agregar una descripción del servicio'))
                 if record.valor_bruto <= 0:
                     raise UserError(_('El valor bruto debe ser mayor a cero'))
                 if not record.email_destinatario or '@' not in record.email_destinatario:
                     raise UserError(_('Debe indicar un correo destinatario válido (ej: correo@dominio.cl)'))
-                data = record._prepare_api_data()
-                response = record._call_simpleapi(data)
-                if response.get('success') or response.get('numeroDocumento') or response.get('numero') or response.get('folio'):
-                    record._process_successful_response(response)
-                else:
-                    record._process_error_response(response)
+                pending.append((record, record._prepare_api_data()))
+            except Exception as e:
+                record._set_emission_error(e)
+        if not pending:
+            return
+        if len(pending) == 1:
+            record, data = pending[0]
+            record._finish_emission(lambda: _post_emitir(data, config))
+            return
+        # Solo las llamadas HTTP van en paralelo; las escrituras del ORM se hacen en este hilo
+        with ThreadPoolExecutor(max_workers=min(_EMIT_MAX_WORKERS, len(pending))) as executor:
+            futures = {executor.submit(_post_emitir, data, config): record for record, data in pending}
+            for future in as_completed(futures):
+                futures[future]._finish_emission(future.result)
+
+    def _finish_emission(self, get_response):
+        """
+        Procesa en el hilo principal la respuesta de /bhe/emitir; get_response devuelve el resp o relanza el error HTTP.
+        """
+        self.ensure_one()
+        try:
+            try:
+                resp = get_response()
             except Exception as e:
-                _logger.error(f"Error emitiendo boleta {record.id}: {str(e)}")
-                record.state = 'error'
-                record.error_message = str(e)
-                record.message_post(body=f"Error emitiendo boleta: {str(e)}", message_type='comment')
+                raise UserError(_(f"Error inesperado llamando SimpleAPI: {str(e)}"))
+            response, raw = self._parse_emitir_response(resp)
+            if any(map(response.get, _SUCCESS_KEYS)):
+                self._process_successful_response(response, raw=raw)
+            else:
+                self._process_error_response(response, raw=raw)
+        except Exception as e:
+            self._set_emission_error(e)
+
+    def _set_emission_error(self, error):
+        self.ensure_one()
+        _logger.error("Error emitiendo boleta %s: %s", self.id, error)
+        self.write({'state': 'error', 'error_message': str(error)})
+        self.message_post(body=f"Error emitiendo boleta: {str(error)}", message_type='comment')
 
     def _prepare_api_data(self):
         self.ensure_one()
+        fecha = self.fecha_emision
         return {
-            'RutUsuario': self.rut_usuario.replace('.', '').replace('-', ''),
+            'RutUsuario': _clean_rut(self.rut_usuario),
             'PasswordSII': self.password_sii,
             'Retencion': int(self.retencion),
-            'FechaEmision': self.fecha_emision.strftime('%d-%m-%Y'),
+            'FechaEmision': f"{fecha.day:02d}-{fecha.month:02d}-{fecha.year:04d}",
             'Emisor': {'Direccion': self.direccion_emisor},
             'Receptor': {
-                'Rut': self.receptor_rut.replace('.', '').replace('-', ''),
+                'Rut': _clean_rut(self.receptor_rut),
                 'Nombre': self.receptor_nombre,
                 'Direccion': self.receptor_direccion,
                 'Region': int(self.receptor_region),
@@ -174,94 +355,129 @@ class BoletaHonorarios(models.Model):
             'Detalles': [{'Nombre': self.descripcion_servicio, 'Valor': int(self.valor_bruto)}]
         }  # [3]
 
-    def _call_simpleapi(self, data):
-        config = self.get_simpleapi_config()
-        try:
-            headers = {
-                'Content-Type': 'application/json',
-                'Accept': 'application/json',
-                'Authorization': config['api_key']
-            }
-            url = f"{config['base_url']}/bhe/emitir"
-            _logger.info(f"🚀 [BHE] POST emitir -> {url} key={_mask_key(headers['Authorization'])}")
-            resp = requests.post(url, json=data, headers=headers, timeout=config['timeout'])
-            _logger.info(f"[BHE] emitir status={resp.status_code} body={resp.text[:300]}")
-            if resp.status_code == 200:
-                return resp.json()
-            raise UserError(_(f"Error en API: {resp.status_code} - {resp.text}"))
-        except UserError:
-            raise
-        except Exception as e:
-            raise UserError(_(f"Error inesperado llamando SimpleAPI: {str(e)}"))  # [1][3]
+    def _parse_emitir_response(self, resp):
+        """
+        Devuelve (respuesta parseada, cuerpo original) para guardar el texto tal cual en response_data.
+        """
+        _logger.info("[BHE] emitir status=%s body=%s", resp.status_code, _preview(resp))
+        if resp.status_code == 200:
+            return _json_loads(resp.content), resp.text
+        raise UserError(_(f"Error en API: {resp.status_code} - {resp.text}"))
 
-    def _send_mail_via_simpleapi(self, folio: str, anio: int, email: str, wait_seconds: int = 1):
+    def _send_mail_via_simpleapi(self, folio: str, anio: int, email: str, config=None):
         self.ensure_one()
-        if wait_seconds:
-            time.sleep(wait_seconds)
-        config = self.get_simpleapi_config()
+        config = config or self.get_simpleapi_config()
         url = f"{config['base_url']}/bhe/mail/{folio}/{anio}"
-        headers = {
-            'Authorization': config['api_key'],
-            'Accept': 'application/json',
-            'Content-Type': 'application/json',
-            'User-Agent': 'odoo-18-bhe'
-        }
         payload = {
-            'RutUsuario': self.rut_usuario.replace('.', '').replace('-', ''),
+            'RutUsuario': _clean_rut(self.rut_usuario),
             'PasswordSII': self.password_sii,
             'Correo': email
         }
-        _logger.info(f"✉️ [BHE] POST mail {url} key={_mask_key(headers['Authorization'])} -> {payload}")
-        resp = requests.post(url, json=payload, headers=headers, timeout=config['timeout'])
-        _logger.info(f"Mail status={resp.status_code} ct={resp.headers.get('Content-Type')} body={resp.text[:300]}")
+        if _logger.isEnabledFor(logging.INFO):
+            _logger.info("✉️ [BHE] POST mail %s key=%s -> correo=%s", url, _mask_key(config['api_key']), email)
+        resp = _SESSION.post(url, data=_json_body(payload), headers=config['headers'], timeout=config['timeout'])
+        _logger.info("Mail status=%s ct=%s body=%s", resp.status_code, resp.headers.get('Content-Type'), _preview(resp))
         if resp.status_code in (200, 202):
             self.message_post(body=f"Correo solicitado a SimpleAPI (folio {folio}): {email}", message_type='notification')
             return True
         self.message_post(
-            body=f"No se pudo solicitar envío por correo (POST). Status {resp.status_code}. Body: {resp.text[:300]}",
+            body=f"No se pudo solicitar envío por correo (POST). Status {resp.status_code}. Body: {_preview(resp)}",
             message_type='comment'
         )
         return False  # [3]
 
-    def _process_successful_response(self, response):
+    def _process_successful_response(self, response, raw=None):
         self.ensure_one()
-        self.response_data = json.dumps(response, indent=2)
-        folio = (response.get('folio') or response.get('numeroDocumento') or
-                 response.get('numero_boleta') or response.get('numeroBoleta') or response.get('numero'))
+        response_data = raw if raw is not None else _json_dumps(response)
+        folio = next(filter(None, map(response.get, _FOLIO_KEYS)), None)
         if folio:
-            self.numero_boleta = str(folio)
-            self.state = 'emitted'
-            self.error_message = False
-            self.message_post(body=f"Boleta emitida exitosamente. Número: {self.numero_boleta}", message_type='notification')
+            vals = {
+                'numero_boleta': str(folio),
+                'state': 'emitted',
+                'error_message': False,
+                'response_data': response_data,
+            }
             # Año de emisión
             anio = None
-            for k in ('anio', 'anioFolio', 'year', 'anio_emision', 'anioFolioEmitido'):
-                if response.get(k):
-                    try:
-                        anio = int(str(response.get(k))[:4]); break
-                    except Exception:
-                        pass
+            for value in filter(None, map(response.get, _ANIO_KEYS)):
+                try:
+                    anio = int(str(value)[:4]); break
+                except Exception:
+                    pass
             if not anio and self.fecha_emision:
-                anio = fields.Date.from_string(self.fecha_emision).year
-            # Enviar por correo
+                anio = self.fecha_emision.year
+            # Enviar por correo: se deja en cola para cron_send_pending_mails
             if anio and self.email_destinatario:
-                try:
-                    self._send_mail_via_simpleapi(self.numero_boleta, anio, self.email_destinatario, wait_seconds=1)
-                except Exception as e:
-                    _logger.exception(f"Fallo envío de correo por SimpleAPI: {e}")
-                    self.message_post(body=f"Error solicitando envío por correo: {e}", message_type='comment')
+                vals.update(self._schedule_mail(anio))
+            self.write(vals)
+            self.message_post(body=f"Boleta emitida exitosamente. Número: {self.numero_boleta}", message_type='notification')
         else:
-            self.state = 'error'
-            self.error_message = "Respuesta exitosa pero sin número de boleta"
+            self.write({
+                'state': 'error',
+                'error_message': "Respuesta exitosa pero sin número de boleta",
+                'response_data': response_data,
+            })
             self.message_post(body=f"Respuesta exitosa sin folio. Response: {self.response_data}", message_type='comment')  # [3]
 
-    def _process_error_response(self, response):
+    def _schedule_mail(self, anio, delay_seconds=1):
+        """
+        Programa la acción planificada de correos y devuelve los valores a escribir en la boleta.
+        """
+        self.ensure_one()
+        scheduled_at = self._trigger_mail_cron(timedelta(seconds=delay_seconds))
+        return {
+            'mail_pending': True,
+            'mail_scheduled_at': scheduled_at,
+            'mail_anio': anio,
+            'mail_attempts': 0,
+            'mail_error': False,
+        }
+
+    @api.model
+    def _trigger_mail_cron(self, delay):
+        scheduled_at = fields.Datetime.now() + delay
+        cron = self.env.ref('simple_api.ir_cron_send_pending_mails', raise_if_not_found=False)
+        if cron:
+            cron._trigger(scheduled_at)
+        return scheduled_at
+
+    @api.model
+    def cron_send_pending_mails(self):
+        pending = self.search([('mail_pending', '=', True), ('mail_scheduled_at', '<=', fields.Datetime.now())])
+        if not pending:
+            return
+        config = self.get_simpleapi_config()
+        for record in pending:
+            try:
+                sent = record._send_mail_via_simpleapi(record.numero_boleta, record.mail_anio,
+                                                       record.email_destinatario, config=config)
+                error = False if sent else "SimpleAPI no aceptó la solicitud de correo (ver historial)"
+            except Exception as e:
+                _logger.exception("Fallo envío de correo por SimpleAPI: %s", e)
+                record.message_post(body=f"Error solicitando envío por correo: {e}", message_type='comment')
+                sent, error = False, str(e)
+            if sent:
+                record.write({'mail_pending': False, 'mail_error': False})
+            else:
+                # Se reintenta más tarde; tras _MAIL_MAX_ATTEMPTS queda el error registrado en la boleta
+                attempts = record.mail_attempts + 1
+                vals = {'mail_attempts': attempts, 'mail_error': error}
+                if attempts >= _MAIL_MAX_ATTEMPTS:
+                    vals['mail_pending'] = False
+                else:
+                    vals['mail_scheduled_at'] = self._trigger_mail_cron(timedelta(minutes=_MAIL_RETRY_MINUTES))
+                record.write(vals)
+            # Commit por boleta: si el worker muere a mitad de lote no se repiten correos ya aceptados
+            self.env.cr.commit()
+
+    def _process_error_response(self, response, raw=None):
         self.ensure_one()
-        self.state = 'error'
-        error_msg = (response.get('error') or response.get('mensaje') or response.get('message') or
-                     response.get('descripcion') or response.get('detalle') or 'Error desconocido')
-        self.error_message = error_msg
-        self.response_data = json.dumps(response, indent=2)
+        error_msg = next(filter(None, map(response.get, _ERROR_KEYS)), 'Error desconocido')
+        self.write({
+            'state': 'error',
+            'error_message': error_msg,
+            'response_data': raw if raw is not None else _json_dumps(response),
+        })
         self.message_post(body=f"Error en emisión: {error_msg}", message_type='comment')  # [3]
 
     # Se remueven descargas/cron del viewer
@@ -273,34 +489,29 @@ class BoletaHonorarios(models.Model):
 
     # LEGACY: anulación sin path (se conserva y se robustece)
     def action_anular_boleta(self):
+        config = self.get_simpleapi_config()
         for record in self:
             if record.state not in ['emitted', 'downloaded']:
                 raise UserError(_('Solo se pueden anular boletas emitidas'))
             try:
-                config = record.get_simpleapi_config()
-                headers = {
-                    'Content-Type': 'application/json',
-                    'Accept': 'application/json',
-                    'Authorization': config['api_key']
-                }
                 data = {
                     'numeroDocumento': record.numero_boleta,
-                    'rutEmisor': record.rut_usuario.replace('.', '').replace('-', ''),
+                    'rutEmisor': _clean_rut(record.rut_usuario),
                     'passwordSII': record.password_sii
                 }
                 url = f"{config['base_url']}/bhe/anular"
-                _logger.info(f"[BHE] POST legacy {url} key={_mask_key(headers['Authorization'])}")
-                resp = requests.post(url, json=data, headers=headers, timeout=config['timeout'])
-                body_preview = resp.text[:300] if hasattr(resp, 'text') else str(resp)[:300]
+                if _logger.isEnabledFor(logging.INFO):
+                    _logger.info("[BHE] POST legacy %s key=%s", url, _mask_key(config['api_key']))
+                resp = _SESSION.post(url, data=_json_body(data), headers=config['headers'], timeout=config['timeout'])
+                body_preview = _preview(resp)
                 if resp.status_code == 200:
                     ok = False
                     try:
-                        j = resp.json()
+                        j = _json_loads(resp.content)
                         if isinstance(j, dict) and not j.get('error'):
                             ok = True
                     except Exception:
-                        txt = (resp.text or '').lower()
-                        ok = 'anulada' in txt or 'correctamente' in txt
+                        ok = bool(_ANUL_OK_RE.search(resp.content[:_ANUL_SCAN_BYTES]))
                     if ok:
                         record.state = 'cancelled'
                         record.message_post(body=f"Boleta {record.numero_boleta} anulada exitosamente (legacy). Resp: {body_preview}",
@@ -312,6 +523,7 @@ class BoletaHonorarios(models.Model):
 
     # NUEVO: Anulación con {folio}/{motivo} y body con credenciales, manejando texto plano
     def action_anular_boleta_path(self):
+        config = self.get_simpleapi_config()
         for record in self:
             if record.state not in ['emitted', 'downloaded']:
                 raise UserError(_('Solo se pueden anular boletas emitidas o descargadas'))
@@ -320,37 +532,29 @@ class BoletaHonorarios(models.Model):
             if record.motivo_anulacion not in ('1', '2', '3'):
                 raise UserError(_('Debe seleccionar un motivo válido (1, 2 o 3)'))
             try:
-                config = record.get_simpleapi_config()
-                headers = {
-                    'Content-Type': 'application/json',
-                    'Accept': 'application/json',
-                    'Authorization': config['api_key'],
-                    'User-Agent': 'odoo-18-bhe'
-                }
                 folio = str(record.numero_boleta).strip()
                 motivo = record.motivo_anulacion
                 url = f"{config['base_url']}/bhe/anular/{folio}/{motivo}"
                 payload = {
-                    "RutUsuario": record.rut_usuario.replace('.', '').replace('-', ''),
+                    "RutUsuario": _clean_rut(record.rut_usuario),
                     "PasswordSII": record.password_sii
                 }
-                _logger.info(f"🧻 [BHE] POST {url} key={_mask_key(headers['Authorization'])} -> body={{'RutUsuario':'***','PasswordSII':'***'}}")
-                resp = requests.post(url, json=payload, headers=headers, timeout=config['timeout'])
-                body_preview = resp.text[:300] if hasattr(resp, 'text') else str(resp)[:300]
-                _logger.info(f"[BHE] Anular status={resp.status_code} body={body_preview}")
+                if _logger.isEnabledFor(logging.INFO):
+                    _logger.info("🧻 [BHE] POST %s key=%s -> body={'RutUsuario':'***','PasswordSII':'***'}", url, _mask_key(config['api_key']))
+                resp = _SESSION.post(url, data=_json_body(payload), headers=config['headers'], timeout=config['timeout'])
+                body_preview = _preview(resp)
+                _logger.info("[BHE] Anular status=%s body=%s", resp.status_code, body_preview)
 
                 if resp.status_code in (200, 202):
-                    # Intentar JSON
-                    data = None
+                    # Intentar JSON; lo que no sea un dict se trata como texto plano
                     try:
-                        data = resp.json()
+                        data = _json_loads(resp.content)
                     except Exception:
                         data = None
+                    data = data if isinstance(data, dict) else None
 
-                    if isinstance(data, dict):
-                        success_flag = str(data.get('success', 'true')).lower() in ('true', '1', 'yes')
-                        has_error = bool(data.get('error'))
-                        if success_flag and not has_error:
+                    if data is not None:
+                        if str(data.get('success', 'true')).lower() in _TRUTHY and not data.get('error'):
                             record.state = 'cancelled'
                             record.message_post(
                                 body=f"Boleta {folio} anulada exitosamente (motivo {motivo}). Resp: {data}",
@@ -358,30 +562,30 @@ class BoletaHonorarios(models.Model):
                             )
                             continue
                         raise UserError(_('Error anulando boleta: %s') % (data.get('error') or data))
-                    else:
-                        # Texto plano
-                        txt = (resp.text or '').strip()
-                        if txt and ('anulada' in txt.lower() or 'correctamente' in txt.lower()):
-                            record.state = 'cancelled'
-                            record.message_post(
-                                body=f"Boleta {folio} anulada exitosamente (motivo {motivo}). Resp: {txt}",
-                                message_type='notification'
-                            )
-                            continue
-                        # 200 sin JSON ni palabra clave: marcar cancelado pero dejar evidencia
+
+                    # Texto plano
+                    txt = (resp.text or '').strip()
+                    if txt and _ANUL_OK_RE.search(resp.content[:_ANUL_SCAN_BYTES]):
                         record.state = 'cancelled'
                         record.message_post(
-                            body=f"Boleta {folio} anulada (HTTP {resp.status_code}) sin JSON; cuerpo: {txt[:300]}",
+                            body=f"Boleta {folio} anulada exitosamente (motivo {motivo}). Resp: {txt}",
                             message_type='notification'
                         )
                         continue
+                    # 200 sin JSON ni palabra clave: marcar cancelado pero dejar evidencia
+                    record.state = 'cancelled'
+                    record.message_post(
+                        body=f"Boleta {folio} anulada (HTTP {resp.status_code}) sin JSON; cuerpo: {txt[:300]}",
+                        message_type='notification'
+                    )
+                    continue
 
                 # Status distinto de 200/202
                 raise UserError(_('Error anulando boleta: %s - %s') % (resp.status_code, body_preview))
             except UserError:
                 raise
             except Exception as e:
-                _logger.warning(f"[BHE] Error inesperado anulando boleta {record.numero_boleta}: {e}")
+                _logger.warning("[BHE] Error inesperado anulando boleta %s: %s", record.numero_boleta, e)
                 raise UserError(_('Error inesperado anulando boleta: %s') % str(e))  # [4][3]
 
     @api.model
@@ -394,31 +598,29 @@ class BoletaHonorarios(models.Model):
             if rec.valor_bruto <= 0:
                 raise ValidationError(_('El valor bruto debe ser mayor a cero'))
 
+    # Odoo solo ejecuta estas restricciones cuando el campo viene en los vals;
+    # en lotes se valida cada RUT distinto una sola vez.
     @api.constrains('rut_usuario')
     def _check_rut_usuario(self):
-        for rec in self:
-            if rec.rut_usuario and not self._validate_rut(rec.rut_usuario):
-                raise ValidationError(_('El RUT del usuario no es válido'))
+        ruts = set(filter(None, self.mapped('rut_usuario')))
+        if not all(map(self._validate_rut, ruts)):
+            raise ValidationError(_('El RUT del usuario no es válido'))
 
     @api.constrains('receptor_rut')
     def _check_receptor_rut(self):
-        for rec in self:
-            if rec.receptor_rut and not self._validate_rut(rec.receptor_rut):
-                raise ValidationError(_('El RUT del receptor no es válido'))
+        ruts = set(filter(None, self.mapped('receptor_rut')))
+        if not all(map(self._validate_rut, ruts)):
+            raise ValidationError(_('El RUT del receptor no es válido'))
 
-    def _validate_rut(self, rut):
+    @staticmethod
+    def _validate_rut(rut):
         if not rut:
             return False
-        rut = rut.replace('.', '').replace('-', '').upper()
+        rut = _clean_rut(rut).upper()
         if len(rut) < 8:
             return False
         numero, dv = rut[:-1], rut[-1]
-        if not numero.isdigit():
+        if not (numero.isascii() and numero.isdigit()):
             return False
-        suma, mult = 0, 2
-        for d in reversed(numero):
-            suma += int(d) * mult
-            mult = mult + 1 if mult < 7 else 2
-        resto = suma % 11
-        dv_calc = '0' if resto == 0 else 'K' if resto == 1 else str(11 - resto)
-        return dv == dv_calc
\ No newline at end of file
+        suma = sum((ord(c) - 48) * w for c, w in zip(reversed(numero), cycle(_RUT_WEIGHTS)))
+        return dv == _RUT_DV[suma % 11]
\ No newline at end of file
@@ -22,4 +22,10 @@ class ResConfigSettings(models.TransientModel):
         config_parameter='boleta_honorarios.simpleapi_timeout',
         default=30,
         help='Tiempo límite para las peticiones HTTP'
+    )
+
+    simpleapi_log_inicio = fields.Boolean(
+        string='Registrar inicio de emisión',
+        config_parameter='boleta_honorarios.simpleapi_log_inicio',
+        help='Publica un mensaje en el chatter al iniciar cada emisión'
     )
\ No newline at end of file